@@ -0,0 +1,98 @@
+"""Fused scaled-dot-product attention for OpenCLIP's transformer blocks."""
+
+import logging
+
+import torch
+import torch.nn.functional as F
+from open_clip.transformer import ResidualAttentionBlock
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+
+class SDPAttention(nn.Module):
+    """
+    Drop-in replacement for nn.MultiheadAttention in OpenCLIP's self-attention.
+
+    Uses F.scaled_dot_product_attention, which dispatches to FlashAttention
+    (or the memory-efficient kernel when a mask is given) and computes
+    attention in tiles without materialising the full score matrix. The
+    projections reuse the original parameters, so no weights are copied.
+    """
+
+    def __init__(self, attn: nn.MultiheadAttention):
+        """
+        Wrap the parameters of an existing attention module.
+
+        Args:
+            attn: Self-attention module with packed q/k/v projections
+        """
+        super().__init__()
+        dim = attn.embed_dim
+        self.num_heads = attn.num_heads
+        self.batch_first = attn.batch_first
+
+        # Plain Linear layers (on the meta device, then pointed at the existing
+        # parameters) so dynamic quantization can pick them up
+        self.in_proj = nn.Linear(
+            dim, 3 * dim, bias=attn.in_proj_bias is not None, device="meta"
+        )
+        self.in_proj.weight = attn.in_proj_weight
+        self.in_proj.bias = attn.in_proj_bias
+        self.out_proj = nn.Linear(
+            dim, dim, bias=attn.out_proj.bias is not None, device="meta"
+        )
+        self.out_proj.weight = attn.out_proj.weight
+        self.out_proj.bias = attn.out_proj.bias
+
+    def forward(
+        self,
+        query: torch.Tensor,
+        key: torch.Tensor | None = None,
+        value: torch.Tensor | None = None,
+        need_weights: bool = False,
+        attn_mask: torch.Tensor | None = None,
+    ) -> tuple[torch.Tensor, None]:
+        """Self-attention over `query` (key/value are the same tensor in OpenCLIP)."""
+        x = query if self.batch_first else query.transpose(0, 1)
+        batch, seq, dim = x.shape
+
+        # (batch, seq, 3 * dim) -> 3 x (batch, heads, seq, head_dim)
+        qkv = self.in_proj(x).view(batch, seq, 3, self.num_heads, -1)
+        q, k, v = qkv.permute(2, 0, 3, 1, 4).unbind(0)
+
+        if attn_mask is not None:
+            attn_mask = attn_mask.to(q.dtype)
+        out = F.scaled_dot_product_attention(q, k, v, attn_mask=attn_mask)
+
+        out = self.out_proj(out.transpose(1, 2).reshape(batch, seq, dim))
+        if not self.batch_first:
+            out = out.transpose(0, 1)
+        return out, None
+
+
+def use_sdpa_attention(model: nn.Module) -> int:
+    """
+    Swap the attention in every self-attention block of a model for SDPAttention.
+
+    Cross-attention blocks (e.g. CoCa's pooler) are left untouched.
+
+    Args:
+        model: OpenCLIP model
+
+    Returns:
+        Number of attention modules replaced
+    """
+    replaced = 0
+    for block in model.modules():
+        if (
+            isinstance(block, ResidualAttentionBlock)
+            and isinstance(block.attn, nn.MultiheadAttention)
+            and block.attn._qkv_same_embed_dim
+            and not hasattr(block, "ln_1_kv")
+        ):
+            block.attn = SDPAttention(block.attn)
+            replaced += 1
+
+    logger.info(f"Using scaled_dot_product_attention in {replaced} blocks")
+    return replaced
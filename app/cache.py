@@ -0,0 +1,138 @@
+"""In-memory LRU cache for computed embeddings."""
+
+import asyncio
+import hashlib
+import logging
+import os
+
+import numpy as np
+from cachetools import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of embedding vectors keyed by a hash of their input.
+
+    Search traffic is heavily skewed towards a few popular queries and images,
+    so a hit skips tokenization/download and the whole forward pass.
+    """
+
+    def __init__(self, maxsize: int = 10_000, identity: str = ""):
+        """
+        Initialize the cache.
+
+        Args:
+            maxsize: Maximum number of embeddings kept in memory
+            identity: Describes the model producing the embeddings (name,
+                weights, precision); saved caches from a different model are
+                discarded on load
+        """
+        self.identity = identity
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def text_key(text: str) -> bytes:
+        """
+        Cache key for a text query.
+
+        Whitespace and case are normalized the same way the CLIP tokenizer
+        does, so queries that tokenize identically share an entry.
+        """
+        normalized = " ".join(text.split()).lower()
+        return hashlib.blake2b(b"text:" + normalized.encode(), digest_size=16).digest()
+
+    @staticmethod
+    def url_key(url: str) -> bytes:
+        """Cache key for an image URL."""
+        return hashlib.blake2b(b"url:" + url.encode(), digest_size=16).digest()
+
+    @staticmethod
+    def content_key(data: bytes) -> bytes:
+        """Cache key for downloaded image bytes, so duplicate images share an entry."""
+        return hashlib.sha256(data).digest()
+
+    async def get(self, key: bytes, count_miss: bool = True) -> np.ndarray | None:
+        """
+        Look up an embedding, returning None on a miss.
+
+        Args:
+            key: Cache key
+            count_miss: Count a miss in the stats; pass False for a lookup that
+                is followed by another one for the same request, so each
+                request counts as exactly one hit or miss
+        """
+        async with self._lock:
+            embedding = self._cache.get(key)
+        if embedding is None:
+            if count_miss:
+                self.misses += 1
+        else:
+            self.hits += 1
+        return embedding
+
+    async def set(self, key: bytes, embedding: np.ndarray) -> None:
+        """Store an embedding, evicting the least recently used entry if full."""
+        # Copy so the entry doesn't keep the whole batch array it came from alive
+        async with self._lock:
+            self._cache[key] = embedding.copy()
+
+    def stats(self) -> dict[str, int]:
+        """Hit/miss counters and current size, for the health endpoint."""
+        return {
+            "embedding_cache_hits": self.hits,
+            "embedding_cache_misses": self.misses,
+            "embedding_cache_size": len(self._cache),
+        }
+
+    def save(self, path: str) -> None:
+        """
+        Persist the cached embeddings to disk for a warm start.
+
+        Written to a temporary file first so concurrent workers shutting down
+        at the same time never leave a partial file behind.
+        """
+        if not self._cache:
+            return
+
+        keys = list(self._cache.keys())
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                identity=np.array(self.identity),
+                keys=np.array([key.hex() for key in keys]),
+                embeddings=np.stack([self._cache[key] for key in keys]),
+            )
+        os.replace(tmp_path, path)
+        logger.info(f"Saved {len(keys)} cached embeddings to {path}")
+
+    def load(self, path: str) -> None:
+        """
+        Load embeddings saved by save(), if the file exists.
+
+        The file is ignored if it was saved by a different model, whose
+        vectors wouldn't be comparable with this one's.
+        """
+        if not os.path.exists(path):
+            return
+
+        try:
+            with np.load(path) as data:
+                identity = str(data["identity"]) if "identity" in data else None
+                if identity != self.identity:
+                    logger.warning(
+                        f"Ignoring embedding cache {path}: saved by {identity}, "
+                        f"running {self.identity}"
+                    )
+                    return
+                for key, embedding in zip(data["keys"], data["embeddings"]):
+                    self._cache[bytes.fromhex(str(key))] = embedding.copy()
+        except Exception as e:
+            logger.warning(f"Could not load embedding cache from {path}: {e}")
+            return
+        logger.info(f"Loaded {len(self._cache)} cached embeddings from {path}")
@@ -1,5 +1,7 @@
 """Configuration settings for the embeddings service."""
 
+from typing import Literal
+
 from pydantic import ConfigDict
 from pydantic_settings import BaseSettings
 
@@ -13,9 +15,37 @@ class Settings(BaseSettings):
     # Model configuration
     model_name: str = "ViT-B-32"
     pretrained: str = "laion2b_s34b_b79k"
+    openclip_cache_dir: str | None = None
+
+    # Inference optimisation
+    backend: Literal["torch", "onnx"] = "torch"
+    onnx_dir: str = "onnx_models"
+    compile_model: bool = True
+    cuda_graphs: bool = True
+    quantization: Literal["none", "int8"] = "none"
+
+    # Request batching
+    max_batch_size: int = 32
+    batch_wait_ms: float = 5.0
+    preprocess_workers: int = 4
+
+    # Embedding cache (set CACHE_PATH to persist it across restarts)
+    cache_size: int = 10_000
+    cache_path: str | None = None
+
+    # Semantic text cache (set SEMANTIC_CACHE_THRESHOLD, e.g. 0.98, to enable)
+    semantic_cache_threshold: float | None = None
+    semantic_cache_size: int = 10_000
 
     # Server configuration
     workers: int = 4
+    # Seconds a gunicorn worker may go silent; must cover startup compilation
+    worker_timeout: int = 600
+    # Load the model in the gunicorn master (CPU only, CUDA can't be
+    # initialised before forking)
+    preload: bool = False
+    # Pin each gunicorn worker to its own share of the cores (CPU only)
+    pin_cpus: bool = False
 
     model_config = ConfigDict(
         env_file=".env",
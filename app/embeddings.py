@@ -1,108 +1,867 @@
 """Embedding generation using OpenCLIP models."""
 
+import asyncio
+import contextlib
 import logging
-from io import BytesIO
-from typing import List
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from io import SEEK_CUR, SEEK_END, SEEK_SET, RawIOBase
+from typing import Any, List
 
 import httpx
+import numpy as np
 import open_clip
 import torch
+import torch.nn.functional as F
 from PIL import Image
+from torch import nn
+from torchvision import transforms
+from torchvision.io import ImageReadMode, decode_image, decode_jpeg
+from torchvision.transforms.functional import pil_to_tensor
+
+from .attention import use_sdpa_attention
+from .cache import EmbeddingCache
 
 logger = logging.getLogger(__name__)
 
+# Batch sizes captured as CUDA graphs; batches are padded up to the nearest one
+CUDA_GRAPH_BATCH_SIZES = (1, 2, 4, 8, 16)
+
+# Largest image body accepted from a remote server
+MAX_IMAGE_BYTES = 64 * 1024 * 1024
+
+
+class _BufferReader(RawIOBase):
+    """Read-only file object over a buffer, so PIL can parse it without a copy."""
+
+    def __init__(self, buffer: bytes | bytearray):
+        self._view = memoryview(buffer)
+        self._pos = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        chunk = self._view[self._pos : self._pos + len(b)]
+        b[: len(chunk)] = chunk
+        self._pos += len(chunk)
+        return len(chunk)
+
+    def seek(self, offset: int, whence: int = SEEK_SET) -> int:
+        base = {SEEK_SET: 0, SEEK_CUR: self._pos, SEEK_END: len(self._view)}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self) -> int:
+        return self._pos
+
+
+class _CudaGraphRunner:
+    """
+    Replays CUDA graphs captured around an encoder for a fixed set of batch sizes.
+
+    Kernel launch overhead dominates small ViT batches; replaying a captured
+    graph issues the whole forward pass as a single launch. Inputs are copied
+    into a static buffer, padded up to the nearest captured batch size, and
+    batches larger than the biggest graph are split into chunks.
+
+    Not thread-safe: the static buffers are shared, so calls must be serialised
+    (the batching loop guarantees this).
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[torch.Tensor], torch.Tensor],
+        sample: torch.Tensor,
+        batch_sizes: tuple[int, ...] = CUDA_GRAPH_BATCH_SIZES,
+        memory_format: torch.memory_format = torch.contiguous_format,
+    ):
+        """
+        Capture one graph per batch size.
+
+        Args:
+            encode: Encoder to capture, taking a batch and returning features
+            sample: A single (unbatched) input defining shape, dtype and device
+            batch_sizes: Batch sizes to capture
+            memory_format: Layout of the static input buffer (inputs are
+                copied into it, so this is the layout the graphs see)
+        """
+        self.batch_sizes = sorted(batch_sizes)
+        self.input_buffer = torch.zeros(
+            (self.batch_sizes[-1], *sample.shape),
+            dtype=sample.dtype,
+            device=sample.device,
+            memory_format=memory_format,
+        )
+        self.graphs: dict[int, torch.cuda.CUDAGraph] = {}
+        self.output_buffers: dict[int, torch.Tensor] = {}
+
+        # Warm up on a side stream so lazy init (cuBLAS handles, autotuning)
+        # happens outside of capture
+        stream = torch.cuda.Stream()
+        stream.wait_stream(torch.cuda.current_stream())
+        with torch.cuda.stream(stream):
+            for batch_size in self.batch_sizes:
+                for _ in range(3):
+                    encode(self.input_buffer[:batch_size])
+        torch.cuda.current_stream().wait_stream(stream)
+
+        # Capture largest first so the smaller graphs can share its memory pool
+        pool = None
+        for batch_size in reversed(self.batch_sizes):
+            graph = torch.cuda.CUDAGraph()
+            with torch.cuda.graph(graph, pool=pool):
+                self.output_buffers[batch_size] = encode(self.input_buffer[:batch_size])
+            pool = graph.pool()
+            self.graphs[batch_size] = graph
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        """Encode a batch by replaying the smallest graph that fits it."""
+        results = []
+        for chunk in batch.split(self.batch_sizes[-1]):
+            size = chunk.shape[0]
+            graph_size = next(bs for bs in self.batch_sizes if bs >= size)
+            self.input_buffer[:size].copy_(chunk)
+            self.graphs[graph_size].replay()
+            # Clone since the output buffer is overwritten on the next replay
+            results.append(self.output_buffers[graph_size][:size].clone())
+        return torch.cat(results)
+
 
 class EmbeddingModel:
     """
     OpenCLIP model wrapper for generating text and image embeddings.
 
     The model is loaded once on initialization and kept in memory for fast inference.
+    Concurrent requests are coalesced into batches by a background loop per
+    modality, so N in-flight requests share a single forward pass.
     """
 
-    def __init__(self, model_name: str, pretrained: str):
+    def __init__(
+        self,
+        model_name: str,
+        pretrained: str,
+        max_batch_size: int = 32,
+        batch_wait_ms: float = 5.0,
+        compile_model: bool = True,
+        cuda_graphs: bool = True,
+        cache_size: int = 10_000,
+        backend: str = "torch",
+        onnx_dir: str = "onnx_models",
+        preprocess_workers: int = 4,
+        model_cache_dir: str | None = None,
+        quantization: str = "none",
+        semantic_cache_threshold: float | None = None,
+        semantic_cache_size: int = 10_000,
+    ):
         """
         Initialize the embedding model.
 
         Args:
             model_name: Name of the OpenCLIP model (e.g., 'ViT-B-32')
             pretrained: Pretrained weights to use (e.g., 'laion2b_s34b_b79k')
+            max_batch_size: Maximum number of requests encoded in one forward pass
+            batch_wait_ms: How long to wait for more requests before encoding a batch
+            compile_model: Compile the encoders with torch.compile (call warmup()
+                before serving so the first request doesn't pay for compilation)
+            cuda_graphs: Capture the encoders as CUDA graphs in warmup() (GPU only)
+            cache_size: Maximum number of embeddings kept in the LRU cache
+            backend: Inference runtime, 'torch' or 'onnx' (ONNX Runtime, needs
+                the optional onnxruntime dependency)
+            onnx_dir: Directory exported ONNX models and TensorRT engines are
+                cached in
+            preprocess_workers: Threads used to decode and preprocess images
+            model_cache_dir: Where pretrained weights are downloaded to (defaults
+                to OpenCLIP's cache); point at a persistent volume to skip the
+                download on cold starts
+            quantization: 'int8' to dynamically quantize the linear layers on
+                CPU (the GPU runs in FP16 instead), or 'none'
+            semantic_cache_threshold: Cosine similarity above which text
+                queries share a cached embedding (None disables the semantic
+                cache, which needs the optional hnswlib dependency)
+            semantic_cache_size: Maximum number of text embeddings in the
+                semantic cache
         """
+        if backend not in ("torch", "onnx"):
+            raise ValueError(f"Unknown backend: {backend}")
+        if quantization not in ("none", "int8"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+
         logger.info(f"Loading OpenCLIP model: {model_name} ({pretrained})")
 
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logger.info(f"Using device: {self.device}")
-
-        # Load model and preprocessing
-        self.model, _, self.preprocess = open_clip.create_model_and_transforms(
-            model_name, pretrained=pretrained
+        # Half precision on GPU halves memory traffic and uses Tensor Cores.
+        # ONNX Runtime picks its own precision (TensorRT FP16), so the exported
+        # graph stays in float32
+        use_half = self.device == "cuda" and backend == "torch"
+        self.dtype = torch.float16 if use_half else torch.float32
+        # NHWC lets cuDNN pick Tensor Core kernels for the patch embedding conv
+        self.memory_format = (
+            torch.channels_last if use_half else torch.contiguous_format
         )
-        self.model.to(self.device)
+        logger.info(f"Using device: {self.device} ({self.dtype})")
+
+        # Load model (preprocessing is rebuilt below to work on tensors)
+        self.model = self._load_model(model_name, pretrained, model_cache_dir)
+        # Fused attention kernels (FlashAttention on GPU) instead of
+        # nn.MultiheadAttention's separate matmul/softmax/matmul
+        use_sdpa_attention(self.model)
+        self.model.to(self.device, dtype=self.dtype, memory_format=self.memory_format)
         self.model.eval()
+        self.quantized = quantization == "int8" and self.device == "cpu"
+        if self.quantized and backend == "torch":
+            self._quantize_model()
+        self.preprocess = self._build_preprocess()
 
         # Load tokenizer for text
         self.tokenizer = open_clip.get_tokenizer(model_name)
 
+        # Encoder entry points, swapped for compiled/traced/ONNX versions
+        self.cuda_graphs = cuda_graphs and use_half
+        self._encode_text = self.model.encode_text
+        self._encode_image = self.model.encode_image
+        self._compiled = False
+        if backend == "onnx":
+            self._load_onnx_encoders(
+                f"{model_name}-{pretrained}", onnx_dir, quantize=self.quantized
+            )
+        elif compile_model:
+            self._compile_encoders()
+
+        # Batching configuration (queues are created in start())
+        self.max_batch_size = max_batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self._text_queue: asyncio.Queue | None = None
+        self._image_queue: asyncio.Queue | None = None
+        self._workers: list[asyncio.Task] = []
+
+        # Image pipeline: downloads run on the event loop, decode/preprocess in
+        # a thread pool, and on GPU host-to-device copies use their own stream
+        # so they overlap with the forward pass on the image compute stream
+        self.preprocess_workers = preprocess_workers
+        self._preprocess_pool: ThreadPoolExecutor | None = None
+        if self.device == "cuda":
+            self._copy_stream = torch.cuda.Stream()
+            self._image_stream = torch.cuda.Stream()
+
+        # Pinned staging buffers for device-to-host copies, one per modality
+        # since the text and image loops can run at the same time
+        self._text_out_buf = self._pinned_output_buffer()
+        self._image_out_buf = self._pinned_output_buffer()
+
+        # Fixed-size token buffer on the device. The tokenizer always pads to
+        # the context length, so every batch is a slice of the same storage
+        self._tok_buf = torch.zeros(
+            max_batch_size,
+            self.model.context_length,
+            dtype=torch.long,
+            device=self.device,
+        )
+
+        # Bound concurrent forward passes. On CPU each pass already uses the
+        # whole intra-op threadpool, so overlapping them just oversubscribes cores
+        self._infer_sem = asyncio.Semaphore(1 if self.device == "cpu" else 4)
+
+        # Repeated queries/images are served from memory
+        # Persisted caches are only reused by the same model and precision
+        precision = "int8" if self.quantized else str(self.dtype).removeprefix("torch.")
+        self.cache = EmbeddingCache(
+            maxsize=cache_size,
+            identity=f"{model_name}/{pretrained}/{backend}/{precision}",
+        )
+        self.semantic_cache = None
+        if semantic_cache_threshold is not None:
+            # Optional dependency, only imported when the semantic cache is on
+            from .semantic_cache import SemanticCache
+
+            self.semantic_cache = SemanticCache(
+                threshold=semantic_cache_threshold, max_elements=semantic_cache_size
+            )
+
         logger.info("Model loaded successfully")
 
-    async def embed_text(self, text: str) -> list[float]:
+    def warmup(self) -> None:
+        """
+        Run dummy batches through both encoders.
+
+        This triggers compilation up front. If compilation fails (e.g. no C++
+        toolchain for Inductor), the encoders fall back to TorchScript tracing.
+        On GPU the image encoder is then captured as CUDA graphs.
+
+        Raises:
+            Exception: If the encoders fail and weren't compiled (e.g. an ONNX
+                Runtime error), as there is nothing to fall back to
+        """
+        logger.info("Warming up encoders")
+        try:
+            self._run_warmup()
+        except Exception as e:
+            if not self._compiled:
+                raise
+            logger.warning(f"Compiled encoders failed ({e}), falling back to tracing")
+            self._compiled = False
+            self._trace_encoders()
+            self._run_warmup()
+
+        if self.cuda_graphs:
+            self._capture_cuda_graphs()
+        logger.info("Warmup complete")
+
+    def start(self) -> None:
+        """
+        Start the background batching loops.
+
+        Must be called from the running event loop, e.g. in the app lifespan.
+        """
+        self._text_queue = asyncio.Queue()
+        self._image_queue = asyncio.Queue()
+        self._preprocess_pool = ThreadPoolExecutor(
+            max_workers=self.preprocess_workers, thread_name_prefix="preprocess"
+        )
+        self._workers = [
+            asyncio.create_task(
+                self._batch_loop(self._text_queue, self._encode_text_batch)
+            ),
+            asyncio.create_task(
+                self._batch_loop(self._image_queue, self._encode_image_batch)
+            ),
+        ]
+
+    async def stop(self) -> None:
+        """Stop the batching loops and cancel any requests still queued."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        for queue in (self._text_queue, self._image_queue):
+            while queue is not None and not queue.empty():
+                _, future = queue.get_nowait()
+                future.cancel()
+
+        if self._preprocess_pool is not None:
+            self._preprocess_pool.shutdown(wait=False, cancel_futures=True)
+            self._preprocess_pool = None
+
+    async def embed_text(
+        self, text: str, return_bytes: bool = False
+    ) -> list[float] | np.ndarray:
         """
         Generate embedding for text query.
 
         Args:
             text: Text string to embed
+            return_bytes: Return the raw float32 array (for binary responses)
+                instead of building a list
 
         Returns:
-            Normalized embedding vector as a list of floats
+            Normalized embedding vector as a list of floats (or array)
         """
-        with torch.no_grad():
-            # Tokenize text
-            text_tokens = self.tokenizer([text]).to(self.device)
-
-            # Generate embedding
-            text_features = self.model.encode_text(text_tokens)
-
-            # Normalize to unit vector
-            text_features /= text_features.norm(dim=-1, keepdim=True)
-
-            # Convert to list
-            return text_features.cpu().numpy()[0].tolist()
+        key = EmbeddingCache.text_key(text)
+        embedding = await self.cache.get(key)
+        if embedding is None:
+            embedding = await self._submit(self._text_queue, text)
+            # Paraphrases of a recent query reuse its embedding
+            if self.semantic_cache is not None:
+                embedding = self.semantic_cache.match_or_add(embedding)
+            await self.cache.set(key, embedding)
+        return embedding if return_bytes else embedding.tolist()
 
-    async def embed_image(self, image_url: str) -> list[float]:
+    async def embed_image(
+        self, image_url: str, return_bytes: bool = False
+    ) -> list[float] | np.ndarray:
         """
         Generate embedding for image from URL.
 
         Args:
             image_url: URL of the image to embed
+            return_bytes: Return the raw float32 array (for binary responses)
+                instead of building a list
 
         Returns:
-            Normalized embedding vector as a list of floats
+            Normalized embedding vector as a list of floats (or array)
 
         Raises:
             httpx.HTTPError: If image download fails
             PIL.UnidentifiedImageError: If image cannot be opened
         """
-        # Download image
-        async with httpx.AsyncClient() as client:
-            response = await client.get(image_url, timeout=30.0)
+        # A URL miss isn't counted, as the content lookup below decides
+        # whether this request is a hit or a miss
+        url_key = EmbeddingCache.url_key(image_url)
+        embedding = await self.cache.get(url_key, count_miss=False)
+        if embedding is not None:
+            return embedding if return_bytes else embedding.tolist()
+
+        image_data = await self._download(image_url)
+
+        # The same image may be served from several URLs
+        content_key = EmbeddingCache.content_key(image_data)
+        embedding = await self.cache.get(content_key)
+        if embedding is None:
+            # Decode and preprocess off the event loop so other requests'
+            # downloads and the current batch's forward pass keep going. On CPU
+            # the scripted transforms use the same intra-op threadpool as the
+            # forward pass, so they take the inference slot too rather than
+            # oversubscribing cores
+            slot = self._infer_sem if self.device == "cpu" else contextlib.nullcontext()
+            async with slot:
+                image_tensor = await asyncio.get_running_loop().run_in_executor(
+                    self._preprocess_pool, self._decode_and_preprocess, image_data
+                )
+            embedding = await self._submit(self._image_queue, image_tensor)
+            await self.cache.set(content_key, embedding)
+
+        await self.cache.set(url_key, embedding)
+        return embedding if return_bytes else embedding.tolist()
+
+    @staticmethod
+    async def _download(image_url: str) -> bytearray:
+        """
+        Download an image with the shared client (so connections are reused).
+
+        The body is streamed into one buffer preallocated from Content-Length,
+        rather than collected in chunks and joined, so large images are only
+        held in memory once.
+
+        Raises:
+            httpx.HTTPError: If image download fails
+            ValueError: If the image is larger than MAX_IMAGE_BYTES
+        """
+        async with http_client.stream("GET", image_url) as response:
             response.raise_for_status()
-            image_data = response.content
+            # Don't trust the declared length further than the size limit
+            declared = int(response.headers.get("content-length", 0))
+            buf = bytearray(min(declared, MAX_IMAGE_BYTES))
+            pos = 0
+            # Slice assignment grows the buffer if the (decoded) body turns out
+            # larger than Content-Length, e.g. for compressed responses
+            async for chunk in response.aiter_bytes(64 * 1024):
+                if pos + len(chunk) > MAX_IMAGE_BYTES:
+                    raise ValueError(f"Image is larger than {MAX_IMAGE_BYTES} bytes")
+                buf[pos : pos + len(chunk)] = chunk
+                pos += len(chunk)
+        del buf[pos:]
+        return buf
+
+    async def _submit(self, queue: asyncio.Queue | None, payload: Any) -> np.ndarray:
+        """
+        Queue a payload for the batching loop and wait for its embedding.
 
-        # Open and preprocess image
-        image = Image.open(BytesIO(image_data)).convert("RGB")
+        Raises:
+            RuntimeError: If start() has not been called
+        """
+        if queue is None:
+            raise RuntimeError("EmbeddingModel.start() must be called first")
 
-        with torch.no_grad():
-            # Preprocess image
-            image_tensor = self.preprocess(image).unsqueeze(0).to(self.device)
+        future = asyncio.get_running_loop().create_future()
+        await queue.put((payload, future))
+        return await future
+
+    async def _batch_loop(
+        self,
+        queue: asyncio.Queue,
+        encode: Callable[[list[Any]], list[np.ndarray]],
+    ) -> None:
+        """
+        Drain the queue into batches and scatter the results back to callers.
+
+        The first request opens a window of `batch_wait` seconds; anything that
+        arrives within it (up to `max_batch_size`) is encoded in the same pass.
+        """
+        loop = asyncio.get_running_loop()
 
-            # Generate embedding
-            image_features = self.model.encode_image(image_tensor)
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                # asyncio.TimeoutError only became the builtin in Python 3.11,
+                # and the service runs on 3.10
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
 
-            # Normalize to unit vector
-            image_features /= image_features.norm(dim=-1, keepdim=True)
+            # Callers may have gone away (e.g. client disconnect) while queued
+            batch = [
+                (payload, future) for payload, future in batch if not future.done()
+            ]
+            if not batch:
+                continue
 
-            # Convert to list
-            return image_features.cpu().numpy()[0].tolist()
+            try:
+                # Run the forward pass off the event loop so new requests can
+                # keep queueing up for the next batch in the meantime
+                async with self._infer_sem:
+                    results = await asyncio.to_thread(
+                        encode, [payload for payload, _ in batch]
+                    )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    @staticmethod
+    def _load_model(
+        model_name: str, pretrained: str, cache_dir: str | None
+    ) -> nn.Module:
+        """
+        Create the OpenCLIP model with memory-mapped pretrained weights.
+
+        torch.load(mmap=True) pages the checkpoint in lazily rather than reading
+        the whole file, and load_state_dict(assign=True) keeps the parameters
+        backed by the mapped file, so forked workers share the same pages until
+        the weights are cast or moved to the GPU. Checkpoints that can't be
+        mapped (e.g. OpenAI's TorchScript archives) use OpenCLIP's own loader.
+        """
+        pretrained_cfg = open_clip.get_pretrained_cfg(model_name, pretrained)
+        if not pretrained_cfg:
+            # A local checkpoint path rather than a known pretrained tag
+            model, _, _ = open_clip.create_model_and_transforms(
+                model_name, pretrained=pretrained, cache_dir=cache_dir
+            )
+            return model
+
+        checkpoint_path = open_clip.download_pretrained(
+            pretrained_cfg, cache_dir=cache_dir
+        )
+        try:
+            model = open_clip.create_model(
+                model_name,
+                force_quick_gelu=pretrained_cfg.get("quick_gelu", False),
+            )
+            state_dict = torch.load(
+                checkpoint_path, map_location="cpu", mmap=True, weights_only=True
+            )
+            state_dict = state_dict.get("state_dict", state_dict)
+            state_dict = {k.removeprefix("module."): v for k, v in state_dict.items()}
+            model.load_state_dict(state_dict, assign=True)
+        except Exception as e:
+            logger.warning(f"Could not memory-map {checkpoint_path} ({e})")
+            model, _, _ = open_clip.create_model_and_transforms(
+                model_name, pretrained=pretrained, cache_dir=cache_dir
+            )
+            return model
+
+        # Normally set by create_model when it loads the pretrained weights
+        model.visual.image_mean = (
+            pretrained_cfg.get("mean") or open_clip.OPENAI_DATASET_MEAN
+        )
+        model.visual.image_std = (
+            pretrained_cfg.get("std") or open_clip.OPENAI_DATASET_STD
+        )
+        logger.info(f"Memory-mapped weights from {checkpoint_path}")
+        return model
+
+    def _build_preprocess(self) -> torch.jit.ScriptModule:
+        """
+        Build a tensor-based equivalent of OpenCLIP's PIL preprocessing.
+
+        Operating on decoded uint8 tensors lets resize/crop/normalize run on
+        the GPU instead of in PIL on the CPU.
+        """
+        # Square inputs resize the shortest side, like OpenCLIP's transform
+        # (TorchScript needs the size as a list rather than a bare int)
+        image_size = self._image_size()
+        resize = [image_size[0]] if image_size[0] == image_size[1] else list(image_size)
+        mean = getattr(self.model.visual, "image_mean", None)
+        std = getattr(self.model.visual, "image_std", None)
+
+        preprocess = nn.Sequential(
+            transforms.Resize(
+                resize,
+                interpolation=transforms.InterpolationMode.BICUBIC,
+                antialias=True,
+            ),
+            transforms.CenterCrop(image_size),
+            transforms.ConvertImageDtype(self.dtype),
+            transforms.Normalize(
+                mean=mean or open_clip.OPENAI_DATASET_MEAN,
+                std=std or open_clip.OPENAI_DATASET_STD,
+            ),
+        )
+        return torch.jit.script(preprocess).to(self.device)
+
+    def _decode_image(self, image_data: bytearray) -> torch.Tensor:
+        """
+        Decode image bytes into a uint8 RGB (3, H, W) tensor on the model's device.
+
+        JPEGs are decoded with nvJPEG on GPU, and with PIL in draft mode on
+        CPU. Anything else (or JPEGs nvJPEG rejects) is decoded on the CPU,
+        with PIL as a last resort for formats torchvision can't read.
+
+        Raises:
+            PIL.UnidentifiedImageError: If image cannot be opened
+        """
+        if self.device == "cpu" and image_data[:2] == b"\xff\xd8":
+            # libjpeg-turbo can decode straight to 1/2, 1/4 or 1/8 scale (never
+            # below the model input size), skipping most of the decode work for
+            # large images
+            image = Image.open(_BufferReader(image_data))
+            height, width = self._image_size()
+            image.draft("RGB", (width, height))
+            return pil_to_tensor(image.convert("RGB"))
+
+        # Shares memory with the downloaded buffer rather than copying it
+        data = torch.frombuffer(image_data, dtype=torch.uint8)
+
+        if self.device == "cuda" and image_data[:2] == b"\xff\xd8":
+            try:
+                return decode_jpeg(data, mode=ImageReadMode.RGB, device="cuda")
+            except RuntimeError:
+                pass
+
+        try:
+            image = decode_image(data, mode=ImageReadMode.RGB)
+        except RuntimeError:
+            image = pil_to_tensor(Image.open(_BufferReader(image_data)).convert("RGB"))
+
+        if self.device == "cuda":
+            # Pinned memory makes the copy an async DMA on the current stream
+            return image.pin_memory().to(self.device, non_blocking=True)
+        return image
+
+    def _decode_and_preprocess(self, image_data: bytearray) -> torch.Tensor:
+        """
+        Decode and preprocess an image; runs in the preprocessing thread pool.
+
+        On GPU the work is issued on the copy stream and waited for here, in
+        the pool thread, so the image compute stream is never stalled by it.
+        """
+        if self.device != "cuda":
+            return self.preprocess(self._decode_image(image_data))
+
+        with torch.cuda.stream(self._copy_stream):
+            image_tensor = self.preprocess(self._decode_image(image_data))
+            done = torch.cuda.Event()
+            done.record()
+        done.synchronize()
+        return image_tensor
+
+    def _quantize_model(self) -> None:
+        """
+        Swap the model's linear layers for dynamically quantized int8 versions.
+
+        Weights are stored as int8 and activations quantized on the fly, so the
+        matmuls that dominate ViT inference run on VNNI/AVX-512 int8 kernels
+        where available. LayerNorm and the patch embedding conv stay in fp32.
+        """
+        logger.info("Quantizing linear layers to int8")
+        # In place, so the mmap'd fp32 weights aren't copied first
+        torch.ao.quantization.quantize_dynamic(
+            self.model, {nn.Linear}, dtype=torch.qint8, inplace=True
+        )
+        # OpenCLIP reads the text tower's compute dtype from a Linear's weight,
+        # which is a method on quantized modules; it checks this attribute first
+        for module in self.model.modules():
+            if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+                module.int8_original_dtype = self.dtype
+
+    def _load_onnx_encoders(
+        self, name: str, onnx_dir: str, quantize: bool = False
+    ) -> None:
+        """Export the encoders to ONNX (once) and run them with ONNX Runtime."""
+        # Optional dependency, only imported when the ONNX backend is selected
+        from .onnx_backend import OnnxEncoder, export_encoders
+
+        text_path, vision_path = export_encoders(
+            self.model,
+            self._dummy_tokens(2),
+            self._dummy_images(2),
+            onnx_dir,
+            name,
+            quantize=quantize,
+        )
+        self._encode_text = OnnxEncoder(text_path, onnx_dir)
+        self._encode_image = OnnxEncoder(vision_path, onnx_dir)
+
+    def _compile_encoders(self) -> None:
+        """Compile the encoders to cut per-op Python dispatch overhead."""
+        if not hasattr(torch, "compile"):
+            self._trace_encoders()
+            return
+
+        # Inductor's own CUDA graphs can't be nested inside ours
+        mode = "default" if self.cuda_graphs else "reduce-overhead"
+        logger.info(f"Compiling encoders with torch.compile (mode={mode})")
+        self._compiled = True
+        self._encode_text = torch.compile(
+            self.model.encode_text, mode=mode, fullgraph=False
+        )
+        self._encode_image = torch.compile(
+            self.model.encode_image, mode=mode, fullgraph=False
+        )
+
+    def _trace_encoders(self) -> None:
+        """Trace the encoders with TorchScript, falling back to eager on failure."""
+        logger.info("Tracing encoders with TorchScript")
+        try:
+            # no_grad rather than inference_mode: the tracer records version
+            # counters, which inference tensors don't have
+            with torch.no_grad(), self._autocast():
+                traced = torch.jit.trace_module(
+                    self.model,
+                    {
+                        "encode_text": self._dummy_tokens(2),
+                        "encode_image": self._dummy_images(2),
+                    },
+                )
+        except Exception as e:
+            logger.warning(f"Tracing failed ({e}), using eager encoders")
+            self._encode_text = self.model.encode_text
+            self._encode_image = self.model.encode_image
+            return
+
+        self._traced_text = traced.encode_text
+        self._traced_visual = traced.encode_image
+        self._encode_text = self._traced_text
+        self._encode_image = self._traced_visual
+
+    def _capture_cuda_graphs(self) -> None:
+        """
+        Capture both encoders as CUDA graphs, leaving either uncaptured on failure.
+
+        Both towers have fixed input shapes (images at the model resolution,
+        tokens padded to the context length). The text tower pools with a bare
+        torch.arange, which would create a host tensor mid-capture, so capture
+        runs with the model's device as the default device.
+        """
+        logger.info(f"Capturing CUDA graphs for batch sizes {CUDA_GRAPH_BATCH_SIZES}")
+        with torch.inference_mode(), self._autocast(), torch.device(self.device):
+            try:
+                self._encode_image = _CudaGraphRunner(
+                    self._encode_image,
+                    self._dummy_images(1)[0],
+                    memory_format=self.memory_format,
+                )
+            except Exception as e:
+                logger.warning(f"Image encoder capture failed ({e}), running without")
+
+            try:
+                self._encode_text = _CudaGraphRunner(
+                    self._encode_text, self._dummy_tokens(1)[0]
+                )
+            except Exception as e:
+                logger.warning(f"Text encoder capture failed ({e}), running without")
+
+    def _run_warmup(self) -> None:
+        """Encode dummy batches of two sizes so dynamic shapes get compiled too."""
+        self.preprocess(torch.zeros(3, 256, 256, dtype=torch.uint8, device=self.device))
+        for batch_size in (1, 2):
+            self._encode_text_batch(["warmup"] * batch_size)
+            self._encode_image_batch(list(self._dummy_images(batch_size).cpu()))
+
+    def _dummy_tokens(self, batch_size: int) -> torch.Tensor:
+        """Tokenized placeholder text, used for warmup and tracing."""
+        return self.tokenizer(["warmup"] * batch_size).to(self.device)
+
+    def _dummy_images(self, batch_size: int) -> torch.Tensor:
+        """Blank image batch at the model's input resolution."""
+        return torch.zeros(
+            batch_size, 3, *self._image_size(), device=self.device, dtype=self.dtype
+        ).contiguous(memory_format=self.memory_format)
+
+    def _image_size(self) -> tuple[int, int]:
+        """The vision tower's input resolution as (height, width)."""
+        image_size = self.model.visual.image_size
+        if isinstance(image_size, int):
+            return (image_size, image_size)
+        return tuple(image_size)
+
+    def _autocast(self) -> contextlib.AbstractContextManager:
+        """Mixed-precision context for GPU inference (a no-op on CPU)."""
+        if self.device != "cuda":
+            return contextlib.nullcontext()
+        # The weight-cast cache is disabled as it isn't allowed during graph
+        # capture (and the weights are already in half precision anyway)
+        return torch.autocast(device_type="cuda", dtype=self.dtype, cache_enabled=False)
+
+    def _encode_text_batch(self, texts: list[str]) -> list[np.ndarray]:
+        """Encode a batch of texts into normalized embeddings."""
+        with torch.inference_mode(), self._autocast():
+            # Tokenize text into the preallocated device buffer
+            text_tokens = self._tok_buf[: len(texts)]
+            text_tokens.copy_(self.tokenizer(texts), non_blocking=True)
+
+            # Generate embeddings (upcast so the JSON output keeps fp32 values)
+            text_features = self._encode_text(text_tokens).float()
+
+            # Normalize to unit vectors
+            text_features = F.normalize(text_features, dim=-1)
+
+            return self._to_host(text_features, self._text_out_buf)
+
+    def _encode_image_batch(
+        self, image_tensors: list[torch.Tensor]
+    ) -> list[np.ndarray]:
+        """Encode a batch of preprocessed images into normalized embeddings."""
+        with torch.inference_mode(), self._autocast(), self._image_stream_context():
+            # Inputs were allocated on the copy stream; tell the caching
+            # allocator they're used here so their memory isn't reused early
+            for image_tensor in image_tensors:
+                if image_tensor.is_cuda:
+                    image_tensor.record_stream(torch.cuda.current_stream())
+
+            image_batch = torch.stack(image_tensors).to(
+                self.device, dtype=self.dtype, memory_format=self.memory_format
+            )
+
+            # Generate embeddings (upcast so the JSON output keeps fp32 values)
+            image_features = self._encode_image(image_batch).float()
+
+            # Normalize to unit vectors
+            image_features = F.normalize(image_features, dim=-1)
+
+            return self._to_host(image_features, self._image_out_buf)
+
+    def _image_stream_context(self) -> contextlib.AbstractContextManager:
+        """Run on the dedicated image compute stream (a no-op on CPU)."""
+        if self.device != "cuda":
+            return contextlib.nullcontext()
+        return torch.cuda.stream(self._image_stream)
+
+    def _pinned_output_buffer(self) -> torch.Tensor | None:
+        """Page-locked host buffer sized for a full batch of features (GPU only)."""
+        if self.device != "cuda":
+            return None
+        return torch.empty(
+            self.max_batch_size,
+            self.model.visual.output_dim,
+            dtype=torch.float32,
+            pin_memory=True,
+        )
+
+    def _to_host(
+        self, features: torch.Tensor, out_buf: torch.Tensor | None
+    ) -> list[np.ndarray]:
+        """
+        Copy a batch of features to host memory as one array per row.
+
+        On GPU the copy is a non-blocking DMA into the pinned buffer rather
+        than a synchronous copy into freshly allocated pageable memory. The
+        rows are copied out since the buffer is reused by the next batch.
+        """
+        if out_buf is None:
+            return list(features.numpy())
+
+        staging = out_buf[: features.shape[0]]
+        staging.copy_(features, non_blocking=True)
+        torch.cuda.current_stream().synchronize()
+        return list(staging.numpy().copy())
 
 
 # Global model instance (loaded on startup)
 embedding_model: EmbeddingModel = None
+
+# Global pooled HTTP client for image downloads (created on startup)
+http_client: httpx.AsyncClient = None
@@ -1,9 +1,14 @@
 """FastAPI application for generating text and image embeddings."""
 
 import logging
+import os
 from contextlib import asynccontextmanager
 
-from fastapi import Depends, FastAPI, HTTPException
+import httpx
+import numpy as np
+import torch
+from fastapi import Depends, FastAPI, HTTPException, Response
+from fastapi.responses import ORJSONResponse
 
 from . import embeddings
 from .auth import verify_token
@@ -19,26 +24,81 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def load_embedding_model() -> EmbeddingModel:
+    """
+    Load the embedding model from the current settings.
+
+    Called from the lifespan, or once in the gunicorn master when the app is
+    preloaded so forked workers share the weights copy-on-write.
+
+    Returns:
+        The loaded EmbeddingModel
+    """
+    logger.info(f"Loading model: {settings.model_name} ({settings.pretrained})")
+
+    return EmbeddingModel(
+        settings.model_name,
+        settings.pretrained,
+        max_batch_size=settings.max_batch_size,
+        batch_wait_ms=settings.batch_wait_ms,
+        compile_model=settings.compile_model,
+        cuda_graphs=settings.cuda_graphs,
+        cache_size=settings.cache_size,
+        backend=settings.backend,
+        onnx_dir=settings.onnx_dir,
+        preprocess_workers=settings.preprocess_workers,
+        model_cache_dir=settings.openclip_cache_dir,
+        quantization=settings.quantization,
+        semantic_cache_threshold=settings.semantic_cache_threshold,
+        semantic_cache_size=settings.semantic_cache_size,
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Lifecycle manager for the FastAPI app.
 
-    Loads the embedding model on startup and keeps it in memory
-    for the duration of the application.
+    Loads the embedding model on startup (unless it was preloaded before the
+    worker forked) and keeps it in memory for the duration of the application.
+    The request batching loops and the pooled HTTP client run for the same
+    lifetime.
     """
     # Startup: Load model
-    logger.info(f"Loading model: {settings.model_name} ({settings.pretrained})")
+    if embeddings.embedding_model is None:
+        embeddings.embedding_model = load_embedding_model()
+    if settings.cache_path:
+        embeddings.embedding_model.cache.load(settings.cache_path)
+    # Input shapes are fixed, so let cuDNN benchmark and cache the fastest
+    # conv algorithms
+    torch.backends.cudnn.benchmark = torch.cuda.is_available()
+    # Forward passes are serialised on CPU, so each one can use every core this
+    # worker is allowed to run on (its pinned slice under gunicorn)
+    if hasattr(os, "sched_getaffinity"):
+        torch.set_num_threads(len(os.sched_getaffinity(0)))
+    else:
+        torch.set_num_threads(os.cpu_count())
+    # Pay compilation cost now rather than on the first request
+    embeddings.embedding_model.warmup()
+    embeddings.embedding_model.start()
 
-    embeddings.embedding_model = EmbeddingModel(
-        settings.model_name, settings.pretrained
+    # One pooled client for all image downloads, so TCP/TLS handshakes are
+    # paid once per host rather than once per request
+    embeddings.http_client = httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+        timeout=httpx.Timeout(30.0, connect=5.0),
     )
 
     logger.info("Model loaded successfully - ready to accept requests")
     yield
 
-    # Shutdown: cleanup if needed
+    # Shutdown: stop batching loops and close pooled connections
     logger.info("Shutting down")
+    await embeddings.embedding_model.stop()
+    await embeddings.http_client.aclose()
+    if settings.cache_path:
+        embeddings.embedding_model.cache.save(settings.cache_path)
 
 
 app = FastAPI(
@@ -46,8 +106,28 @@ app = FastAPI(
     description="Compute text and image embeddings for artwork search using OpenCLIP",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# Binary responses carry the embedding as little-endian float16, a quarter of
+# the size of the JSON encoding and with no per-float serialization cost
+BINARY_DTYPE = np.dtype("<f2")
+BINARY_RESPONSES = {
+    200: {
+        "content": {"application/octet-stream": {}},
+        "description": "Embedding as raw little-endian float16 bytes",
+    }
+}
+
+
+def binary_embedding_response(embedding: np.ndarray) -> Response:
+    """Wrap an embedding vector in an application/octet-stream response."""
+    return Response(
+        content=embedding.astype(BINARY_DTYPE).tobytes(),
+        media_type="application/octet-stream",
+        headers={"X-Embedding-Dtype": "float16"},
+    )
+
 
 @app.get("/")
 async def root():
@@ -57,11 +137,14 @@ async def root():
     Returns:
         Status information about the service
     """
+    semantic_cache = embeddings.embedding_model.semantic_cache
     return {
         "status": "ok",
         "service": "tate-embeddings",
         "model": settings.model_name,
         "pretrained": settings.pretrained,
+        **embeddings.embedding_model.cache.stats(),
+        **(semantic_cache.stats() if semantic_cache else {}),
     }
 
 
@@ -119,3 +202,63 @@ async def embed_image(request: ImageEmbedRequest, token: str = Depends(verify_to
     except Exception as e:
         logger.error(f"Error embedding image: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/embed-text-bin", response_class=Response, responses=BINARY_RESPONSES)
+async def embed_text_bin(request: TextEmbedRequest, token: str = Depends(verify_token)):
+    """
+    Generate embedding for text query as raw bytes.
+
+    Same as /embed-text, but returns the vector as little-endian float16
+    bytes (application/octet-stream) instead of a JSON list.
+
+    Args:
+        request: Text embedding request with query string
+        token: Authentication token (injected by dependency)
+
+    Returns:
+        Response with the embedding vector as raw bytes
+
+    Raises:
+        HTTPException: If embedding generation fails
+    """
+    try:
+        logger.info(f"Generating text embedding for query: {request.query[:50]}...")
+        embedding = await embeddings.embedding_model.embed_text(
+            request.query, return_bytes=True
+        )
+        return binary_embedding_response(embedding)
+    except Exception as e:
+        logger.error(f"Error embedding text: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/embed-image-bin", response_class=Response, responses=BINARY_RESPONSES)
+async def embed_image_bin(
+    request: ImageEmbedRequest, token: str = Depends(verify_token)
+):
+    """
+    Generate embedding for image from URL as raw bytes.
+
+    Same as /embed-image, but returns the vector as little-endian float16
+    bytes (application/octet-stream) instead of a JSON list.
+
+    Args:
+        request: Image embedding request with image URL
+        token: Authentication token (injected by dependency)
+
+    Returns:
+        Response with the embedding vector as raw bytes
+
+    Raises:
+        HTTPException: If image download or embedding generation fails
+    """
+    try:
+        logger.info(f"Generating image embedding for URL: {request.url}")
+        embedding = await embeddings.embedding_model.embed_image(
+            str(request.url), return_bytes=True
+        )
+        return binary_embedding_response(embedding)
+    except Exception as e:
+        logger.error(f"Error embedding image: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
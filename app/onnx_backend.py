@@ -0,0 +1,197 @@
+"""ONNX Runtime inference backend for the CLIP encoders.
+
+Requires the optional `onnxruntime` (or `onnxruntime-gpu`) dependency.
+"""
+
+import logging
+import os
+import re
+
+import numpy as np
+import onnxruntime as ort
+import torch
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+ONNX_OPSET = 17
+
+# Map torch input dtypes to the numpy types ORT expects when binding buffers
+_NUMPY_DTYPES = {
+    torch.float32: np.float32,
+    torch.float16: np.float16,
+    torch.int32: np.int32,
+    torch.int64: np.int64,
+}
+
+
+class _TextTower(nn.Module):
+    """Expose encode_text as a module forward so it can be exported."""
+
+    def __init__(self, model: nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, text: torch.Tensor) -> torch.Tensor:
+        return self.model.encode_text(text)
+
+
+def export_encoders(
+    model: nn.Module,
+    dummy_tokens: torch.Tensor,
+    dummy_images: torch.Tensor,
+    onnx_dir: str,
+    name: str,
+    quantize: bool = False,
+) -> tuple[str, str]:
+    """
+    Export the text and vision towers to ONNX, reusing earlier exports.
+
+    Args:
+        model: OpenCLIP model in eval mode
+        dummy_tokens: Example token batch for tracing the text tower
+        dummy_images: Example image batch for tracing the vision tower
+        onnx_dir: Directory the .onnx files are cached in
+        name: Model identifier used in the file names
+        quantize: Also write int8 dynamically quantized copies and return those
+
+    Returns:
+        Paths of the (text, vision) ONNX files
+    """
+    os.makedirs(onnx_dir, exist_ok=True)
+    name = re.sub(r"[^\w.-]", "_", name)
+    text_path = os.path.join(onnx_dir, f"{name}-text.onnx")
+    vision_path = os.path.join(onnx_dir, f"{name}-vision.onnx")
+
+    for module, dummy, path in (
+        (_TextTower(model), dummy_tokens, text_path),
+        (model.visual, dummy_images, vision_path),
+    ):
+        if os.path.exists(path):
+            continue
+        logger.info(f"Exporting {path}")
+        # Workers export concurrently on a cold start, so write to a temporary
+        # file first; the others then never see a partially written model
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                module,
+                dummy,
+                tmp_path,
+                input_names=["input"],
+                output_names=["output"],
+                dynamic_axes={"input": {0: "batch"}, "output": {0: "batch"}},
+                opset_version=ONNX_OPSET,
+            )
+        os.replace(tmp_path, path)
+
+    if quantize:
+        return quantize_encoder(text_path), quantize_encoder(vision_path)
+    return text_path, vision_path
+
+
+def quantize_encoder(path: str) -> str:
+    """
+    Quantize an exported encoder's weights to int8, reusing an earlier run.
+
+    Args:
+        path: Path of the fp32 .onnx file
+
+    Returns:
+        Path of the quantized .onnx file
+    """
+    # Needs the onnx package, so only imported when quantization is enabled
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = path.removesuffix(".onnx") + ".int8.onnx"
+    if not os.path.exists(quantized_path):
+        logger.info(f"Quantizing {path}")
+        tmp_path = f"{quantized_path}.{os.getpid()}.tmp"
+        # Only the matmuls: ORT's CPU provider has no ConvInteger kernel, and
+        # the patch embedding conv stays in fp32 like the torch path
+        quantize_dynamic(
+            path,
+            tmp_path,
+            op_types_to_quantize=["MatMul", "Gemm"],
+            per_channel=True,
+            reduce_range=False,
+            weight_type=QuantType.QInt8,
+        )
+        os.replace(tmp_path, quantized_path)
+    return quantized_path
+
+
+class OnnxEncoder:
+    """
+    Run an exported encoder with ONNX Runtime.
+
+    Uses TensorRT (FP16, with an on-disk engine cache) or CUDA on NVIDIA
+    GPUs, OpenVINO on Intel CPUs, and the default CPU provider otherwise,
+    depending on which are available in the installed onnxruntime build.
+    """
+
+    def __init__(self, path: str, cache_dir: str):
+        """
+        Create an inference session for an exported encoder.
+
+        Args:
+            path: Path of the .onnx file
+            cache_dir: Directory for TensorRT's compiled engine cache
+        """
+        preferred = [
+            (
+                "TensorrtExecutionProvider",
+                {
+                    "trt_fp16_enable": True,
+                    "trt_engine_cache_enable": True,
+                    "trt_engine_cache_path": cache_dir,
+                },
+            ),
+            "CUDAExecutionProvider",
+            "OpenVINOExecutionProvider",
+            "CPUExecutionProvider",
+        ]
+        available = ort.get_available_providers()
+        providers = [
+            provider
+            for provider in preferred
+            if (provider[0] if isinstance(provider, tuple) else provider) in available
+        ]
+
+        # Size the CPU thread pool to the cores this worker is pinned to
+        options = ort.SessionOptions()
+        if hasattr(os, "sched_getaffinity"):
+            options.intra_op_num_threads = len(os.sched_getaffinity(0))
+
+        self.session = ort.InferenceSession(
+            path, sess_options=options, providers=providers
+        )
+        self.on_gpu = self.session.get_providers()[0] in (
+            "TensorrtExecutionProvider",
+            "CUDAExecutionProvider",
+        )
+        logger.info(f"Loaded {path} with {self.session.get_providers()}")
+
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        """Encode a batch, returning the features as a CPU tensor."""
+        # Bind the torch buffer directly so GPU inputs aren't round-tripped
+        # through host memory
+        if not self.on_gpu:
+            batch = batch.cpu()
+        batch = batch.contiguous()
+        if batch.is_cuda:
+            # ORT runs on its own stream, so wait for torch's work on the input
+            torch.cuda.current_stream().synchronize()
+
+        binding = self.session.io_binding()
+        binding.bind_input(
+            name="input",
+            device_type=batch.device.type,
+            device_id=batch.device.index or 0,
+            element_type=_NUMPY_DTYPES[batch.dtype],
+            shape=tuple(batch.shape),
+            buffer_ptr=batch.data_ptr(),
+        )
+        binding.bind_output("output")
+        self.session.run_with_iobinding(binding)
+        return torch.from_numpy(binding.copy_outputs_to_cpu()[0])
@@ -0,0 +1,87 @@
+"""Approximate-nearest-neighbour cache of recent text embeddings.
+
+Requires the optional `hnswlib` dependency.
+"""
+
+import logging
+
+import hnswlib
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """
+    HNSW index over recently seen text embeddings.
+
+    The exact-match cache misses paraphrases ("monet water lilies" vs "water
+    lilies by monet"). When a new query's embedding is within `threshold`
+    cosine similarity of a recent one, the earlier embedding is returned
+    instead, so near-duplicate queries get an identical vector and therefore
+    identical (and downstream-cacheable) search results.
+
+    The index is created on the first insert and, once full, the oldest
+    entries are overwritten in ring-buffer order.
+    """
+
+    def __init__(self, threshold: float = 0.98, max_elements: int = 10_000):
+        """
+        Initialize the cache.
+
+        Args:
+            threshold: Minimum cosine similarity for two queries to share an
+                embedding
+            max_elements: Maximum number of embeddings kept in the index
+        """
+        self.threshold = threshold
+        self.max_elements = max_elements
+        self._index: hnswlib.Index | None = None
+        self._embeddings: np.ndarray | None = None
+        self._next_label = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return min(self._next_label, self.max_elements)
+
+    def match_or_add(self, embedding: np.ndarray) -> np.ndarray:
+        """
+        Return a cached embedding similar to `embedding`, or store and return it.
+
+        Args:
+            embedding: Normalized embedding of a new query
+
+        Returns:
+            The nearest cached embedding if it is within the threshold,
+            otherwise `embedding` itself
+        """
+        if self._index is None:
+            self._init_index(embedding.shape[-1])
+        elif len(self):
+            # Single queries are answered faster without hnswlib's thread pool
+            labels, distances = self._index.knn_query(embedding, k=1, num_threads=1)
+            if 1 - distances[0][0] >= self.threshold:
+                self.hits += 1
+                # Copy, as the row is overwritten once the ring buffer wraps
+                return self._embeddings[labels[0][0]].copy()
+
+        # Reusing a label overwrites that element, so the index never grows
+        # past max_elements
+        label = self._next_label % self.max_elements
+        self._index.add_items(embedding[None], [label], num_threads=1)
+        self._embeddings[label] = embedding
+        self._next_label += 1
+        return embedding
+
+    def stats(self) -> dict[str, int]:
+        """Hit counter and current size, for the health endpoint."""
+        return {"semantic_cache_hits": self.hits, "semantic_cache_size": len(self)}
+
+    def _init_index(self, dim: int) -> None:
+        """Allocate the index and embedding store for `dim`-dimensional vectors."""
+        logger.info(f"Creating semantic cache index for {self.max_elements} entries")
+        self._index = hnswlib.Index(space="cosine", dim=dim)
+        self._index.init_index(
+            max_elements=self.max_elements, M=16, ef_construction=200
+        )
+        self._embeddings = np.zeros((self.max_elements, dim), dtype=np.float32)
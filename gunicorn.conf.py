@@ -0,0 +1,58 @@
+"""Gunicorn configuration for the embeddings service.
+
+With PRELOAD enabled the model is loaded once in the master process and
+shared with the forked workers copy-on-write. With PIN_CPUS enabled each
+worker is pinned to its own slice of cores, so their PyTorch / ONNX Runtime
+thread pools don't oversubscribe the machine. Both are for CPU deployments.
+"""
+
+import os
+
+from app.config import settings
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = settings.workers
+worker_class = "uvicorn.workers.UvicornWorker"
+# Workers compile the encoders during startup (warmup blocks the event loop,
+# so no heartbeat is sent), which can take minutes on a cold Inductor cache
+timeout = settings.worker_timeout
+loglevel = "info"
+accesslog = "-"
+errorlog = "-"
+
+# Nothing here may touch CUDA: it can't be initialised before forking, so
+# preloading is an explicit setting rather than a device check. ONNX Runtime
+# sessions aren't fork-safe either, so that backend always loads per worker
+preload_app = settings.preload and settings.backend == "torch"
+
+
+def when_ready(server):
+    """Load the model in the master so workers inherit it instead of reloading."""
+    if not server.cfg.preload_app:
+        return
+
+    from app import embeddings
+    from app.main import load_embedding_model
+
+    embeddings.embedding_model = load_embedding_model()
+
+
+def pre_fork(server, worker):
+    """Give the new worker the lowest CPU slot not held by a running worker."""
+    taken = {getattr(w, "cpu_slot", None) for w in server.WORKERS.values()}
+    worker.cpu_slot = next(
+        slot for slot in range(server.num_workers + 1) if slot not in taken
+    )
+
+
+def post_fork(server, worker):
+    """Pin the worker to its own contiguous set of cores."""
+    if not settings.pin_cpus or not hasattr(os, "sched_setaffinity"):
+        return
+
+    cpus = sorted(os.sched_getaffinity(0))
+    per_worker = max(1, len(cpus) // server.num_workers)
+    start = (worker.cpu_slot * per_worker) % len(cpus)
+    pinned = cpus[start : start + per_worker]
+    os.sched_setaffinity(0, pinned)
+    server.log.info(f"Worker {worker.pid} pinned to CPUs {pinned}")
@@ -0,0 +1,44 @@
+"""Tests for the fused attention replacement."""
+
+import copy
+
+import torch
+from open_clip.transformer import ResidualAttentionBlock
+
+from app.attention import SDPAttention, use_sdpa_attention
+
+
+def test_sdpa_attention_matches_multihead_attention():
+    """Test that swapping the attention leaves a block's output unchanged."""
+    torch.manual_seed(0)
+    block = ResidualAttentionBlock(d_model=64, n_head=4).eval()
+    fused = copy.deepcopy(block)
+    assert use_sdpa_attention(fused) == 1
+    assert isinstance(fused.attn, SDPAttention)
+
+    x = torch.randn(2, 7, 64)
+    if not block.attn.batch_first:
+        x = x.transpose(0, 1)
+    mask = torch.full((7, 7), float("-inf")).triu(1)
+
+    with torch.inference_mode():
+        assert torch.allclose(fused(x), block(x), atol=1e-5)
+        assert torch.allclose(
+            fused(x, attn_mask=mask), block(x, attn_mask=mask), atol=1e-5
+        )
+
+
+def test_sdpa_attention_projections_are_quantized():
+    """Test that dynamic int8 quantization picks up the attention projections."""
+    torch.manual_seed(0)
+    block = ResidualAttentionBlock(d_model=64, n_head=4).eval()
+    use_sdpa_attention(block)
+    quantized = torch.ao.quantization.quantize_dynamic(
+        copy.deepcopy(block), {torch.nn.Linear}, dtype=torch.qint8
+    )
+    assert not isinstance(quantized.attn.in_proj, type(block.attn.in_proj))
+
+    x = torch.randn(7, 2, 64)
+    with torch.inference_mode():
+        similarity = torch.cosine_similarity(quantized(x), block(x), dim=-1)
+    assert similarity.min() > 0.99
@@ -0,0 +1,87 @@
+"""Tests for the embedding cache."""
+
+import numpy as np
+
+from app.cache import EmbeddingCache
+
+
+def test_text_key_normalizes_case_and_whitespace():
+    """Test that queries differing only in case/whitespace share a key."""
+    assert EmbeddingCache.text_key("  Landscape   Painting ") == (
+        EmbeddingCache.text_key("landscape painting")
+    )
+    assert EmbeddingCache.text_key("landscape") != EmbeddingCache.text_key("portrait")
+
+
+def test_key_namespaces_do_not_collide():
+    """Test that text and URL keys for the same string differ."""
+    value = "https://www.tate.org.uk/static/images/default.jpg"
+    assert EmbeddingCache.text_key(value) != EmbeddingCache.url_key(value)
+
+
+async def test_get_and_set_track_hits_and_misses():
+    """Test that lookups are counted as hits or misses."""
+    cache = EmbeddingCache(maxsize=10)
+    key = EmbeddingCache.text_key("landscape painting")
+
+    assert await cache.get(key) is None
+    await cache.set(key, np.ones(4, dtype=np.float32))
+    assert np.array_equal(await cache.get(key), np.ones(4, dtype=np.float32))
+
+    stats = cache.stats()
+    assert stats["embedding_cache_hits"] == 1
+    assert stats["embedding_cache_misses"] == 1
+    assert stats["embedding_cache_size"] == 1
+
+
+async def test_least_recently_used_entry_is_evicted():
+    """Test that the cache stays bounded by evicting the oldest entry."""
+    cache = EmbeddingCache(maxsize=2)
+    keys = [EmbeddingCache.text_key(text) for text in ("a", "b", "c")]
+    for key in keys:
+        await cache.set(key, np.zeros(4, dtype=np.float32))
+
+    assert await cache.get(keys[0]) is None
+    assert await cache.get(keys[2]) is not None
+
+
+async def test_save_and_load_round_trip(tmp_path):
+    """Test that persisted embeddings are restored on load."""
+    path = str(tmp_path / "cache.npz")
+    key = EmbeddingCache.content_key(b"image bytes")
+    embedding = np.arange(4, dtype=np.float32)
+
+    cache = EmbeddingCache()
+    await cache.set(key, embedding)
+    cache.save(path)
+
+    restored = EmbeddingCache()
+    restored.load(path)
+    assert np.array_equal(await restored.get(key), embedding)
+
+
+async def test_load_discards_cache_from_another_model(tmp_path):
+    """Test that embeddings saved by a different model are not served."""
+    path = str(tmp_path / "cache.npz")
+    key = EmbeddingCache.content_key(b"image bytes")
+
+    cache = EmbeddingCache(identity="ViT-B-32/laion2b_s34b_b79k/torch/float32")
+    await cache.set(key, np.arange(4, dtype=np.float32))
+    cache.save(path)
+
+    restored = EmbeddingCache(identity="ViT-B-32/laion2b_s34b_b79k/torch/int8")
+    restored.load(path)
+    assert await restored.get(key) is None
+
+
+async def test_uncounted_miss_is_not_recorded():
+    """Test that a miss looked up with count_miss=False leaves the stats alone."""
+    cache = EmbeddingCache(maxsize=10)
+    key = EmbeddingCache.url_key("https://www.tate.org.uk/static/images/default.jpg")
+
+    assert await cache.get(key, count_miss=False) is None
+    assert cache.stats()["embedding_cache_misses"] == 0
+
+    await cache.set(key, np.ones(4, dtype=np.float32))
+    assert await cache.get(key, count_miss=False) is not None
+    assert cache.stats()["embedding_cache_hits"] == 1
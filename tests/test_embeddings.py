@@ -0,0 +1,189 @@
+"""Tests for the embedding model's download, batching and quantization."""
+
+import asyncio
+
+import httpx
+import numpy as np
+import open_clip
+import pytest
+import torch
+
+from app import embeddings
+from app.attention import use_sdpa_attention
+from app.cache import EmbeddingCache
+from app.embeddings import EmbeddingModel
+
+IMAGE_URL = "https://www.tate.org.uk/static/images/default.jpg"
+BODY = bytes(range(256)) * 1000
+
+
+@pytest.fixture
+async def batcher():
+    """
+    An EmbeddingModel with only the batching state set up (no model loaded).
+
+    Returns a function that starts a batching loop around a fake encoder and
+    gives back its queue; the loops are cancelled after the test.
+    """
+    model = object.__new__(EmbeddingModel)
+    model.max_batch_size = 8
+    model.batch_wait = 0.05
+    model._infer_sem = asyncio.Semaphore(1)
+    tasks = []
+
+    def start(encode):
+        queue = asyncio.Queue()
+        tasks.append(asyncio.create_task(model._batch_loop(queue, encode)))
+        return queue
+
+    yield model, start
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Point the shared HTTP client at a transport returning a fixed response."""
+
+    def install(response: httpx.Response) -> None:
+        transport = httpx.MockTransport(lambda request: response)
+        monkeypatch.setattr(
+            embeddings, "http_client", httpx.AsyncClient(transport=transport)
+        )
+
+    return install
+
+
+async def test_download_without_content_length(serve):
+    """Test that a body with no Content-Length is read in full."""
+    serve(httpx.Response(200, stream=httpx.ByteStream(BODY)))
+    assert await EmbeddingModel._download(IMAGE_URL) == BODY
+
+
+async def test_download_body_longer_than_content_length(serve):
+    """Test that the buffer grows when the body exceeds Content-Length."""
+    serve(httpx.Response(200, headers={"Content-Length": "10"}, content=BODY))
+    assert await EmbeddingModel._download(IMAGE_URL) == BODY
+
+
+async def test_download_body_shorter_than_content_length(serve):
+    """Test that the buffer is trimmed when the body is under Content-Length."""
+    headers = {"Content-Length": str(2 * len(BODY))}
+    serve(httpx.Response(200, headers=headers, content=BODY))
+    assert await EmbeddingModel._download(IMAGE_URL) == BODY
+
+
+async def test_download_rejects_oversized_images(serve, monkeypatch):
+    """Test that a huge declared length neither preallocates nor is accepted."""
+    monkeypatch.setattr(embeddings, "MAX_IMAGE_BYTES", 1000)
+    headers = {"Content-Length": "20000000000"}
+    serve(httpx.Response(200, headers=headers, content=BODY))
+    with pytest.raises(ValueError):
+        await EmbeddingModel._download(IMAGE_URL)
+
+
+async def test_download_raises_on_http_error(serve):
+    """Test that error statuses raise instead of returning the body."""
+    serve(httpx.Response(404, content=b"not found"))
+    with pytest.raises(httpx.HTTPStatusError):
+        await EmbeddingModel._download(IMAGE_URL)
+
+
+async def test_concurrent_submits_share_one_batch(batcher):
+    """Test that requests arriving together are encoded in a single call."""
+    model, start = batcher
+    calls = []
+
+    def encode(payloads):
+        calls.append(payloads)
+        return [np.full(2, payload) for payload in payloads]
+
+    queue = start(encode)
+    results = await asyncio.gather(*(model._submit(queue, i) for i in range(5)))
+
+    assert calls == [[0, 1, 2, 3, 4]]
+    # Each caller gets the result for its own payload
+    for i, result in enumerate(results):
+        assert np.array_equal(result, np.full(2, i))
+
+
+async def test_batch_error_fails_every_request(batcher):
+    """Test that an encoder exception is raised to every caller in the batch."""
+    model, start = batcher
+
+    def encode(payloads):
+        raise RuntimeError("encoder failed")
+
+    queue = start(encode)
+    results = await asyncio.gather(
+        *(model._submit(queue, i) for i in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+async def test_cancelled_request_is_skipped(batcher):
+    """Test that a caller that went away before encoding is left out."""
+    model, start = batcher
+    calls = []
+
+    def encode(payloads):
+        calls.append(payloads)
+        return [np.full(2, payload) for payload in payloads]
+
+    queue = start(encode)
+    cancelled = asyncio.create_task(model._submit(queue, 0))
+    kept = asyncio.create_task(model._submit(queue, 1))
+    # Let both requests queue up, then cancel one within the batch window
+    await asyncio.sleep(0)
+    cancelled.cancel()
+
+    assert np.array_equal(await kept, np.full(2, 1))
+    assert cancelled.cancelled()
+    assert calls == [[1]]
+
+
+def test_quantized_model_encodes():
+    """Test that the fully quantized model still runs both encoders."""
+    model = object.__new__(EmbeddingModel)
+    model.model = open_clip.create_model("ViT-B-32").eval()
+    model.dtype = torch.float32
+    use_sdpa_attention(model.model)
+    model._quantize_model()
+
+    tokens = open_clip.get_tokenizer("ViT-B-32")(["landscape painting"])
+    with torch.inference_mode():
+        text_features = model.model.encode_text(tokens)
+        image_features = model.model.encode_image(torch.zeros(1, 3, 224, 224))
+
+    assert text_features.shape == image_features.shape == (1, 512)
+    assert torch.isfinite(text_features).all()
+    assert torch.isfinite(image_features).all()
+
+
+async def test_image_cache_counts_once_per_request():
+    """Test that URL and content lookups add up to one hit or miss per request."""
+    model = object.__new__(EmbeddingModel)
+    model.device = "cpu"
+    model.cache = EmbeddingCache()
+    model._infer_sem = asyncio.Semaphore(1)
+    model._preprocess_pool = None
+    model._image_queue = None
+
+    async def download(url):
+        return bytearray(BODY)
+
+    async def submit(queue, payload):
+        return np.ones(4, dtype=np.float32)
+
+    model._download = download
+    model._decode_and_preprocess = lambda data: data
+    model._submit = submit
+
+    await model.embed_image(IMAGE_URL)  # new image: miss
+    await model.embed_image(IMAGE_URL + "?copy")  # same bytes, new URL: hit
+    await model.embed_image(IMAGE_URL)  # known URL: hit
+
+    stats = model.cache.stats()
+    assert (stats["embedding_cache_hits"], stats["embedding_cache_misses"]) == (2, 1)
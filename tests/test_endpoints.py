@@ -1,5 +1,6 @@
 """Tests for API endpoints."""
 
+import numpy as np
 import pytest
 
 
@@ -30,6 +31,18 @@ def test_embed_text_success(test_client, auth_headers):
     assert all(-1.5 <= x <= 1.5 for x in data["embedding"])
 
 
+def test_embed_text_repeated_query_is_cached(test_client, auth_headers):
+    """Test that repeating a query returns the same embedding from the cache."""
+    query = {"query": "cached landscape painting"}
+    first = test_client.post("/embed-text", json=query, headers=auth_headers)
+    hits_before = test_client.get("/").json()["embedding_cache_hits"]
+    second = test_client.post("/embed-text", json=query, headers=auth_headers)
+
+    assert second.status_code == 200
+    assert second.json()["embedding"] == first.json()["embedding"]
+    assert test_client.get("/").json()["embedding_cache_hits"] == hits_before + 1
+
+
 def test_embed_text_empty_query(test_client, auth_headers):
     """Test that empty queries are rejected."""
     response = test_client.post("/embed-text", json={"query": ""}, headers=auth_headers)
@@ -108,3 +121,34 @@ def test_embed_text_special_characters(test_client, auth_headers):
     assert response.status_code == 200
     data = response.json()
     assert len(data["embedding"]) == 512
+
+
+def test_embed_text_bin_success(test_client, auth_headers):
+    """Test that the binary text endpoint returns float16 bytes matching JSON."""
+    query = {"query": "landscape painting"}
+    response = test_client.post("/embed-text-bin", json=query, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+
+    embedding = np.frombuffer(response.content, dtype="<f2")
+    assert len(embedding) == 512
+    expected = test_client.post("/embed-text", json=query, headers=auth_headers)
+    assert np.allclose(embedding, expected.json()["embedding"], atol=1e-3)
+
+
+def test_embed_image_bin_success(test_client, auth_headers):
+    """Test that the binary image endpoint returns float16 bytes."""
+    response = test_client.post(
+        "/embed-image-bin",
+        json={"url": "https://www.tate.org.uk/static/images/default.jpg"},
+        headers=auth_headers,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert len(np.frombuffer(response.content, dtype="<f2")) == 512
+
+
+def test_embed_text_bin_unauthenticated(test_client):
+    """Test that unauthenticated binary embedding requests are rejected."""
+    response = test_client.post("/embed-text-bin", json={"query": "landscape"})
+    assert response.status_code == 403
@@ -0,0 +1,46 @@
+"""Tests for the semantic text cache."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("hnswlib")
+
+from app.semantic_cache import SemanticCache  # noqa: E402
+
+
+def unit(vector: list[float]) -> np.ndarray:
+    """Normalize a vector the way the encoders do."""
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def test_near_duplicate_returns_cached_embedding():
+    """Test that a query within the threshold reuses the earlier embedding."""
+    cache = SemanticCache(threshold=0.98, max_elements=10)
+    first = unit([1.0, 0.0, 0.0, 0.0])
+
+    assert np.array_equal(cache.match_or_add(first), first)
+    assert np.array_equal(cache.match_or_add(unit([1.0, 0.01, 0.0, 0.0])), first)
+    assert cache.stats() == {"semantic_cache_hits": 1, "semantic_cache_size": 1}
+
+
+def test_dissimilar_query_is_added():
+    """Test that a query outside the threshold is stored as a new entry."""
+    cache = SemanticCache(threshold=0.98, max_elements=10)
+    cache.match_or_add(unit([1.0, 0.0, 0.0, 0.0]))
+    other = unit([0.0, 1.0, 0.0, 0.0])
+
+    assert np.array_equal(cache.match_or_add(other), other)
+    assert cache.stats() == {"semantic_cache_hits": 0, "semantic_cache_size": 2}
+
+
+def test_oldest_entry_is_replaced_when_full():
+    """Test that the index overwrites its oldest entry once full."""
+    cache = SemanticCache(threshold=0.98, max_elements=2)
+    for i in range(3):
+        cache.match_or_add(unit(np.eye(4)[i]))
+
+    assert len(cache) == 2
+    # The first vector was overwritten, so it is added again rather than matched
+    cache.match_or_add(unit(np.eye(4)[0]))
+    assert cache.hits == 0